@@ -0,0 +1,30 @@
+"""add_chat_history_user_created_index
+
+Revision ID: a3c91e5f7b20
+Revises: d44abe45f251
+Create Date: 2026-10-15 10:12:44.218305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c91e5f7b20'
+down_revision = 'd44abe45f251'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Composite index for per-user history queries (WHERE user_id = ? ORDER BY created_at DESC)
+    op.create_index(
+        'ix_chat_history_user_created',
+        'chat_history',
+        ['user_id', sa.text('created_at DESC')],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chat_history_user_created', table_name='chat_history')
@@ -0,0 +1,37 @@
+"""add_user_chat_count
+
+Revision ID: b7e2d4f81c39
+Revises: a3c91e5f7b20
+Create Date: 2026-10-15 11:03:27.540912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2d4f81c39'
+down_revision = 'a3c91e5f7b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Denormalized chat counter so chat responses don't need COUNT(*) per request
+    op.add_column('users', sa.Column('chat_count', sa.Integer(), server_default='0', nullable=False))
+    
+    # Backfill counts for existing users
+    op.execute("""
+        UPDATE users
+        SET chat_count = counts.total
+        FROM (
+            SELECT user_id, COUNT(*) AS total
+            FROM chat_history
+            GROUP BY user_id
+        ) AS counts
+        WHERE users.id = counts.user_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'chat_count')
@@ -0,0 +1,25 @@
+"""drop_redundant_chat_history_id_index
+
+Revision ID: c5f83a9d2e61
+Revises: b7e2d4f81c39
+Create Date: 2026-10-15 11:41:09.318224
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5f83a9d2e61'
+down_revision = 'b7e2d4f81c39'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The primary key already indexes chat_history.id; the extra index only slows inserts
+    op.drop_index(op.f('ix_chat_history_id'), table_name='chat_history')
+
+
+def downgrade() -> None:
+    op.create_index(op.f('ix_chat_history_id'), 'chat_history', ['id'], unique=False)
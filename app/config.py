@@ -1,5 +1,5 @@
-from pydantic_settings import BaseSettings # type: ignore
-from functools import lru_cache
+from pydantic_settings import BaseSettings, SettingsConfigDict # type: ignore
+from functools import lru_cache, cached_property
 
 
 class Settings(BaseSettings):
@@ -16,6 +16,7 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60  # 1 hour
     RESET_TOKEN_EXPIRE_MINUTES: int = 60  # 1 hour
+    BCRYPT_ROUNDS: int = 10  # bcrypt cost factor for new password hashes
     
     # SendGrid
     SENDGRID_API_KEY: str
@@ -23,6 +24,8 @@ class Settings(BaseSettings):
     
     # Google Gemini
     GEMINI_API_KEY: str
+    GEMINI_MAX_CONCURRENCY: int = 8  # Max in-flight Gemini calls per process
+    GEMINI_RPM: int = 0  # Client-side request pacing per process (0 disables)
     
     # Frontend
     FRONTEND_URL: str = "http://localhost:3000"
@@ -31,13 +34,31 @@ class Settings(BaseSettings):
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_IMAGE_TYPES: list = ["image/jpeg", "image/jpg", "image/png", "image/gif", "image/webp"]
     ALLOWED_AUDIO_TYPES: list = ["audio/mpeg", "audio/mp3"]  # For voice notes
+    SERVE_UPLOADS: bool = True  # Set to false when nginx/CDN serves /uploads directly
     
     # AssemblyAI (for voice transcription)
     ASSEMBLYAI_API_KEY: str = ""  # Get free from https://www.assemblyai.com/
     
-    class Config:
-        env_file = ".env"
-        case_sensitive = True
+    # Speech-to-text backend: "assemblyai" (cloud) or "whisper" (local faster-whisper)
+    STT_BACKEND: str = "assemblyai"
+    WHISPER_MODEL: str = "base.en"
+    WHISPER_DEVICE: str = "cpu"  # "cuda" when a GPU is available
+    WHISPER_COMPUTE_TYPE: str = "int8"
+    
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        case_sensitive=True,
+        frozen=True
+    )
+    
+    # Frozensets for O(1) content-type membership checks
+    @cached_property
+    def ALLOWED_IMAGE_TYPES_SET(self) -> frozenset:
+        return frozenset(self.ALLOWED_IMAGE_TYPES)
+    
+    @cached_property
+    def ALLOWED_AUDIO_TYPES_SET(self) -> frozenset:
+        return frozenset(self.ALLOWED_AUDIO_TYPES)
 
 
 @lru_cache()
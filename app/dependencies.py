@@ -1,7 +1,8 @@
-from fastapi import Depends, HTTPException, status # type: ignore
+import uuid
+from fastapi import Depends, HTTPException, Request, status # type: ignore
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials # type: ignore
 from jose import JWTError, jwt # type: ignore
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import settings
 from app.database import get_db
 from app.models.user import User
@@ -11,7 +12,7 @@ security = HTTPBearer()
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> User:
     """
     Dependency to get current authenticated user from JWT token
@@ -25,15 +26,20 @@ async def get_current_user(
     try:
         token = credentials.credentials
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
+        sub = payload.get("sub")
+        if sub is None:
             raise credentials_exception
-    except JWTError:
+        user_id = uuid.UUID(sub)
+    except (JWTError, ValueError):
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
+    # Primary-key load into this request's session (served from its identity map if already loaded)
+    user = await db.get(User, user_id)
     if user is None:
         raise credentials_exception
-    
     return user
 
+
+def get_base_url(request: Request) -> str:
+    """Public base URL of the API (no trailing slash), computed once per request"""
+    return str(request.base_url).rstrip('/')
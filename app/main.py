@@ -1,18 +1,37 @@
 from fastapi import FastAPI, Request, status # type: ignore
 from fastapi.middleware.cors import CORSMiddleware # type: ignore
-from fastapi.responses import JSONResponse # type: ignore
+from fastapi.responses import ORJSONResponse # type: ignore
 from fastapi.staticfiles import StaticFiles # type: ignore
 import os
+import asyncio
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 from app.routes import auth, chat
 from app.config import settings
 
+# Setup logger
+# Records go through a queue and are written to stderr by a listener thread,
+# so request handlers never block on console I/O
+# (QueueHandler formats each record; the listener writes the finished line)
+_log_queue = queue.SimpleQueue()
+log_listener = QueueListener(_log_queue, logging.StreamHandler())
+log_listener.start()
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(levelname)s:     %(name)s - %(message)s",
+    handlers=[QueueHandler(_log_queue)]
+)
+logger = logging.getLogger(__name__)
+
 # Create FastAPI application
 app = FastAPI(
     title=settings.APP_NAME,
     description="AI Chatbot API with multi-language support (English & Roman Urdu) and image analysis",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse  # Faster JSON encoding for chat payloads
 )
 
 # CORS Configuration - Allow all origins for development and production
@@ -22,14 +41,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor-Created-At", "X-Next-Cursor-Id"],  # History pagination cursor
 )
 
-# Create uploads directory if it doesn't exist
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+# Uploads directory (created once in the startup hook)
+UPLOAD_DIR = chat.UPLOAD_DIR
 
 # Mount static files for image serving
-app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
+# In production, let the reverse proxy / CDN serve /uploads and disable this
+if settings.SERVE_UPLOADS:
+    app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR, check_dir=False), name="uploads")
 
 # Include routers
 app.include_router(auth.router)
@@ -59,7 +80,7 @@ async def health_check():
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={
             "detail": "An internal server error occurred",
@@ -71,13 +92,23 @@ async def global_exception_handler(request: Request, exc: Exception):
 # Startup event
 @app.on_event("startup")
 async def startup_event():
-    print(f"🚀 Starting {settings.APP_NAME}")
-    print(f"📝 Environment: {settings.ENVIRONMENT}")
-    print(f"📚 API Documentation: http://localhost:8000/docs")
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    # Warm speech services in the background so startup isn't held up by the network
+    from app.services.speech_service import speech_service
+    app.state.speech_warmup = asyncio.create_task(speech_service.warmup())
+    logger.info("🚀 Starting %s (environment: %s, docs: /docs)", settings.APP_NAME, settings.ENVIRONMENT)
 
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
-    print(f"👋 Shutting down {settings.APP_NAME}")
+    # Don't leave the speech warmup running past shutdown
+    warmup = getattr(app.state, "speech_warmup", None)
+    if warmup is not None and not warmup.done():
+        warmup.cancel()
+        await asyncio.gather(warmup, return_exceptions=True)
+    from app.services.email_service import close_email_client
+    await close_email_client()
+    logger.info("👋 Shutting down %s", settings.APP_NAME)
+    log_listener.stop()  # Flush queued log records
 
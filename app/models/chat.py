@@ -1,5 +1,5 @@
-import uuid
-from sqlalchemy import Column, String, Text, Boolean, DateTime, ForeignKey, Enum
+import uuid6 # type: ignore
+from sqlalchemy import Column, String, Text, Boolean, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -16,7 +16,8 @@ class MessageType(str, enum.Enum):
 class ChatHistory(Base):
     __tablename__ = "chat_history"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    # Time-ordered UUIDv7 keeps inserts appending to the end of the primary key index
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid6.uuid7)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     message = Column(Text, nullable=False)
     response = Column(Text, nullable=False)
@@ -26,8 +27,16 @@ class ChatHistory(Base):
     response_audio_url = Column(String, nullable=True)  # For TTS audio response
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
-    # Relationship
-    user = relationship("User", back_populates="chats")
+    # Composite index for per-user history queries ordered by newest first
+    __table_args__ = (
+        Index("ix_chat_history_user_created", user_id, created_at.desc()),
+    )
+    
+    # Fetch server defaults (created_at) with INSERT ... RETURNING instead of a separate SELECT
+    __mapper_args__ = {"eager_defaults": True}
+    
+    # Relationship (lazy="raise" surfaces accidental per-row loads; use selectinload where needed)
+    user = relationship("User", back_populates="chats", lazy="raise")
     
     def __repr__(self):
         return f"<ChatHistory {self.id}>"
@@ -36,7 +45,7 @@ class ChatHistory(Base):
 class PasswordResetToken(Base):
     __tablename__ = "password_reset_tokens"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid6.uuid7)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     token = Column(String, unique=True, index=True, nullable=False)
     expires_at = Column(DateTime(timezone=True), nullable=False)
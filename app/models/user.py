@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String, Integer, DateTime
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -15,12 +15,18 @@ class User(Base):
     first_name = Column(String, nullable=False)
     last_name = Column(String, nullable=False)
     hashed_password = Column(String, nullable=False)
+    chat_count = Column(Integer, nullable=False, default=0, server_default="0")  # Maintained on chat insert/delete
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
-    # Relationships
-    chats = relationship("ChatHistory", back_populates="user", cascade="all, delete-orphan")
-    reset_tokens = relationship("PasswordResetToken", back_populates="user", cascade="all, delete-orphan")
+    # Fetch server defaults (created_at/updated_at) via RETURNING on flush,
+    # so a new user never needs a follow-up refresh SELECT
+    __mapper_args__ = {"eager_defaults": True}
+    
+    # Relationships (passive_deletes lets the FK's ON DELETE CASCADE remove children
+    # instead of loading and deleting them row by row)
+    chats = relationship("ChatHistory", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    reset_tokens = relationship("PasswordResetToken", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
     
     def __repr__(self):
         return f"<User {self.username}>"
@@ -1,5 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status # type: ignore
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status # type: ignore
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.schemas.auth import (
     LoginRequest,
@@ -10,7 +10,6 @@ from app.schemas.auth import (
 )
 from app.schemas.user import UserCreate, UserResponse
 from app.services.auth_service import AuthService
-from app.services.email_service import EmailService
 from app.dependencies import get_current_user
 from app.models.user import User
 
@@ -20,7 +19,8 @@ router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register(
     user_data: UserCreate,
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Register a new user
@@ -29,13 +29,13 @@ async def register(
     - **username**: Username (3-50 characters, unique)
     - **password**: Password (min 8 chars, 1 uppercase, 1 lowercase, 1 number)
     """
-    user = AuthService.register_user(db, user_data)
+    from app.services.email_service import EmailService
     
-    # Send welcome email (non-blocking)
-    try:
-        EmailService.send_welcome_email(user.email, user.username)
-    except:
-        pass  # Don't fail registration if email fails
+    user = await AuthService.register_user(db, user_data)
+    
+    # Send welcome email after the response is returned
+    # (send_welcome_email logs its own failures, so registration never fails on email)
+    background_tasks.add_task(EmailService.send_welcome_email, user.email, user.username)
     
     return user
 
@@ -43,7 +43,7 @@ async def register(
 @router.post("/login", response_model=LoginResponse)
 async def login(
     login_data: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Login with email and password
@@ -51,7 +51,7 @@ async def login(
     Returns JWT access token and user information
     """
     # Authenticate user
-    user = AuthService.authenticate_user(db, login_data.email, login_data.password)
+    user = await AuthService.authenticate_user(db, login_data.email, login_data.password)
     
     # Create access token
     access_token = AuthService.create_user_token(user)
@@ -72,7 +72,8 @@ async def login(
 @router.post("/forgot-password", response_model=MessageResponse)
 async def forgot_password(
     request: ForgotPasswordRequest,
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Request password reset email
@@ -81,11 +82,13 @@ async def forgot_password(
     Sends an email with a reset token that expires in 1 hour
     (Token is also printed in console for local testing)
     """
+    from app.services.email_service import EmailService
+    
     # This will raise 404 HTTPException if user not found
-    user, token = AuthService.create_password_reset_token(db, request.email)
+    user, token = await AuthService.create_password_reset_token(db, request.email)
     
-    # Send reset email (will print token in console if email fails)
-    EmailService.send_password_reset_email(user.email, user.username, token)
+    # Send reset email after the response is returned (will print token in console if email fails)
+    background_tasks.add_task(EmailService.send_password_reset_email, user.email, user.username, token)
     
     return {
         "message": "Password reset email sent successfully. Check your inbox."
@@ -95,7 +98,7 @@ async def forgot_password(
 @router.post("/reset-password", response_model=MessageResponse)
 async def reset_password(
     request: ResetPasswordRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Reset password using token from email
@@ -103,7 +106,7 @@ async def reset_password(
     - **token**: Reset token from email
     - **new_password**: New password (min 8 chars, 1 uppercase, 1 lowercase, 1 number)
     """
-    AuthService.reset_password(db, request.token, request.new_password)
+    await AuthService.reset_password(db, request.token, request.new_password)
     
     return {
         "message": "Password has been reset successfully. You can now login with your new password."
@@ -1,29 +1,217 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request # type: ignore
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Response, BackgroundTasks # type: ignore
+from sqlalchemy import select, update, delete, bindparam, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.responses import StreamingResponse # type: ignore
 from typing import List, Optional
+from datetime import datetime
+from uuid import UUID
 import os
+import shutil
 import uuid
-import aiofiles # type: ignore
+import json
+import asyncio
+import logging
 from app.database import get_db
-from app.dependencies import get_current_user
+from app.dependencies import get_current_user, get_base_url
 from app.models.user import User
 from app.models.chat import ChatHistory, MessageType
 from app.schemas.chat import ChatMessageRequest, ChatMessageResponse, ChatHistoryResponse, ChatMessageWithHistoryResponse
-from app.services.gemini_service import gemini_service
 from app.config import settings
 
 router = APIRouter(prefix="/api/chat", tags=["Chat"])
+logger = logging.getLogger(__name__)
 
-# Create uploads directory if it doesn't exist
+# Uploads directory (created by the app startup hook)
 UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+# Copy uploads in 1MB blocks instead of buffering the whole file
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Upload rejection messages, built once at import
+INVALID_AUDIO_TYPE_DETAIL = f"Invalid file type. Allowed types: {', '.join(settings.ALLOWED_AUDIO_TYPES)}"
+INVALID_IMAGE_TYPE_DETAIL = f"Invalid file type. Allowed types: {', '.join(settings.ALLOWED_IMAGE_TYPES)}"
+FILE_TOO_LARGE_DETAIL = f"File too large. Maximum size: {settings.MAX_UPLOAD_SIZE / (1024*1024)}MB"
+INVALID_FILE_CONTENT_DETAIL = "Invalid file content. File does not match its declared type"
+
+# Magic-byte signatures checked against the start of an upload; each
+# signature is a tuple of (offset, magic_bytes) pairs that must all match
+IMAGE_SIGNATURES = (
+    ((0, b"\xff\xd8\xff"),),  # JPEG
+    ((0, b"\x89PNG\r\n\x1a\n"),),  # PNG
+    ((0, b"GIF87a"),),  # GIF
+    ((0, b"GIF89a"),),  # GIF
+    ((0, b"RIFF"), (8, b"WEBP")),  # WebP
+)
+AUDIO_SIGNATURES = (
+    ((0, b"ID3"),),  # MP3 with ID3 tag
+    ((0, b"\xff\xfb"),),  # MP3 frame sync (MPEG-1 Layer III)
+    ((0, b"\xff\xfa"),),
+    ((0, b"\xff\xf3"),),  # MP3 frame sync (MPEG-2 Layer III)
+    ((0, b"\xff\xf2"),),
+)
+
+
+# Hot-path statements built once at import; bind parameters keep them structurally
+# identical across requests so SQLAlchemy reuses the cached compiled SQL
+_PREVIOUS_CHATS_STMT = (
+    select(ChatHistory)
+    .where(ChatHistory.user_id == bindparam("user_id"))
+    .order_by(ChatHistory.created_at.desc())
+    .limit(20)
+)
+_INCREMENT_CHAT_COUNT_STMT = (
+    update(User)
+    .where(User.id == bindparam("user_id"))
+    .values(chat_count=User.chat_count + 1)
+    .returning(User.chat_count)
+)
+
+
+async def _get_previous_chats(db: AsyncSession, user_id):
+    """
+    Get previous chat history (last 20 chats)
+    Called before the current chat is inserted, so it is naturally excluded
+    """
+    result = await db.execute(_PREVIOUS_CHATS_STMT, {"user_id": user_id})
+    return result.scalars().all()
+
+
+async def _with_previous_chats(db: AsyncSession, user_id, coro):
+    """
+    Await coro while the previous chat history loads on the request session
+    The history query is always finished before this returns or raises, so the
+    session is never closed/rolled back with a query still in flight
+    """
+    history_task = asyncio.create_task(_get_previous_chats(db, user_id))
+    try:
+        result = await coro
+    except BaseException:
+        # Let the (cheap) query complete rather than cancelling it mid-flight on the connection
+        await asyncio.gather(history_task, return_exceptions=True)
+        raise
+    return result, await history_task
+
+
+async def _increment_chat_count(db: AsyncSession, user_id) -> int:
+    """
+    Increment the user's maintained chat_count and return the new total
+    (O(1) instead of COUNT(*)); must run in the same transaction as the chat insert
+    """
+    result = await db.execute(_INCREMENT_CHAT_COUNT_STMT, {"user_id": user_id})
+    return result.scalar_one()
+
+
+async def _generate_response_audio(speech_service, text: str, base_url: str) -> Optional[str]:
+    """
+    TTS: Convert AI response to an audio file and return its full URL
+    Returns None if TTS fails for any reason, so the chat is still answered and saved
+    """
+    try:
+        response_audio_filename = f"{uuid.uuid4().hex}.mp3"
+        response_audio_path = f"{UPLOAD_DIR}/{response_audio_filename}"
+        
+        # Convert text to speech
+        await speech_service.convert_text_to_speech(text, response_audio_path)
+        
+        # Generate full URL for the audio file
+        response_audio_url = f"{base_url}/uploads/{response_audio_filename}"
+        logger.debug("TTS successful. response_audio_url: %s", response_audio_url)
+        return response_audio_url
+    except HTTPException as e:
+        # The speech service reports every failure (timeout, gTTS error, not installed)
+        # as an HTTPException; the response is already paid for, so answer without audio
+        logger.warning("TTS failed (%s: %s). Continuing without audio.", e.status_code, e.detail)
+        return None
+    except Exception as e:
+        logger.warning("TTS failed: %s. Continuing without audio.", e)
+        return None
+
+
+def _file_extension(filename: Optional[str], default: str) -> str:
+    """Lowercased extension of an uploaded filename (without the dot), or the default"""
+    _, ext = os.path.splitext(filename or "")
+    return ext[1:].lower() or default
+
+
+def _matches_signature(header: bytes, signatures: tuple) -> bool:
+    """Check whether a file header matches any of the given magic-byte signatures"""
+    return any(
+        all(header[offset:offset + len(magic)] == magic for offset, magic in signature)
+        for signature in signatures
+    )
+
+
+def _write_upload_sync(src, file_path: str, signatures: tuple) -> None:
+    """
+    Validate an upload's spooled file and copy it to disk (runs in a worker thread)
+    Size is found by seeking and the magic bytes are checked before anything is
+    written, so the client-supplied content type is never trusted on its own
+    """
+    size = src.seek(0, os.SEEK_END)
+    src.seek(0)
+    if size > settings.MAX_UPLOAD_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=FILE_TOO_LARGE_DETAIL
+        )
+    
+    if not _matches_signature(src.read(16), signatures):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=INVALID_FILE_CONTENT_DETAIL
+        )
+    
+    src.seek(0)
+    with open(file_path, "wb") as dst:
+        shutil.copyfileobj(src, dst, UPLOAD_CHUNK_SIZE)
+
+
+async def _save_upload(upload: UploadFile, file_path: str, signatures: tuple) -> None:
+    """
+    Save an uploaded file to disk with a single hop to a worker thread
+    instead of one executor round-trip per chunk
+    """
+    await asyncio.to_thread(_write_upload_sync, upload.file, file_path, signatures)
+
+
+def _remove_file_safe(file_path: str) -> None:
+    """Remove a file, ignoring missing files and deletion errors"""
+    try:
+        os.unlink(file_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning("Error deleting file %s: %s", file_path, e)
+
+
+def _purge_files(file_paths: List[str]) -> None:
+    """Remove many files in a single worker thread instead of one task per file"""
+    for file_path in file_paths:
+        _remove_file_safe(file_path)
+
+
+async def _get_user_chat(db: AsyncSession, chat_id: str, user_id):
+    """
+    Get chat by primary key (uses the identity map) and verify ownership
+    Returns None for malformed IDs or chats owned by another user
+    """
+    try:
+        chat_uuid = uuid.UUID(chat_id)
+    except ValueError:
+        return None
+    
+    chat = await db.get(ChatHistory, chat_uuid)
+    if not chat or chat.user_id != user_id:
+        return None
+    return chat
+
 
 @router.post("/message", response_model=ChatMessageWithHistoryResponse, summary="Send Text Message", description="Send a text message to the chatbot. Returns AI text response + audio response URL with chat history.")
 async def send_message(
-    request: Request,
     message: str = Form(..., description="Text message to send to the chatbot"),  # Required text message
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    base_url: str = Depends(get_base_url)
 ):
     """
     **Send Text Message to Chatbot**
@@ -35,6 +223,7 @@ async def send_message(
     
     **Returns:** Current chat + previous chat history (last 20 chats) + audio response URL
     """
+    from app.services.gemini_service import gemini_service
     from app.services.speech_service import speech_service
     
     # Validate and process message
@@ -43,27 +232,11 @@ async def send_message(
     # Generate AI response
     ai_response = await gemini_service.generate_text_response(message_text)
 
-    # TTS: Convert response to audio
-    response_audio_url = None
-    try:
-        response_audio_filename = f"{uuid.uuid4()}.mp3"
-        response_audio_path = os.path.join(UPLOAD_DIR, response_audio_filename)
-        
-        # Convert text to speech
-        await speech_service.convert_text_to_speech(ai_response, response_audio_path)
-        
-        # Generate full URL for the audio file
-        base_url = str(request.base_url).rstrip('/')
-        response_audio_url = f"{base_url}/uploads/{response_audio_filename}"
-        print(f"[DEBUG] TTS successful for text message. response_audio_url: {response_audio_url}")
-    except HTTPException as e:
-        # Re-raise HTTP exceptions (like service not available)
-        print(f"[ERROR] TTS HTTPException: {str(e)}")
-        raise
-    except Exception as e:
-        # For other exceptions, continue without audio but log the error
-        print(f"[WARNING] TTS failed for text message: {str(e)}. Continuing without audio.")
-        response_audio_url = None
+    # TTS: Convert response to audio while previous chat history loads
+    response_audio_url, previous_chats = await _with_previous_chats(
+        db, current_user.id,
+        _generate_response_audio(speech_service, ai_response, base_url)
+    )
 
     # Save to database (text message with audio response)
     chat_entry = ChatHistory(
@@ -76,22 +249,12 @@ async def send_message(
     )
 
     db.add(chat_entry)
-    db.commit()
-    db.refresh(chat_entry)
+    # Flush runs INSERT ... RETURNING so id/created_at are populated without a refresh
+    await db.flush()
+    total_chats = await _increment_chat_count(db, current_user.id)
+    await db.commit()
     
-    # Debug: Verify response_audio_url is set
-    print(f"[DEBUG] Text message saved - response_audio_url: {chat_entry.response_audio_url}")
-
-    # Get previous chat history (excluding current one, last 20 chats)
-    previous_chats = db.query(ChatHistory).filter(
-        ChatHistory.user_id == current_user.id,
-        ChatHistory.id != chat_entry.id
-    ).order_by(ChatHistory.created_at.desc()).limit(20).all()
-
-    # Get total chat count
-    total_chats = db.query(ChatHistory).filter(
-        ChatHistory.user_id == current_user.id
-    ).count()
+    logger.debug("Text message saved - response_audio_url: %s", chat_entry.response_audio_url)
 
     # Ensure response_audio_url is included in response
     response_data = {
@@ -100,18 +263,82 @@ async def send_message(
         "total_chats": total_chats
     }
     
-    # Debug: Verify text message response
-    print(f"[DEBUG] Text message response - response_audio_url: {chat_entry.response_audio_url}")
-    
     return response_data
 
 
+def _sse_event(data: str, event: Optional[str] = None) -> str:
+    """Format a Server-Sent Event (multi-line data is split into data: lines)"""
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+@router.post("/message/stream", summary="Send Text Message (Streaming)", description="Send a text message to the chatbot and stream the AI response as Server-Sent Events.")
+async def send_message_stream(
+    message: str = Form(..., description="Text message to send to the chatbot"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    **Send Text Message to Chatbot (Streaming)**
+    
+    - Streams the AI response as it is generated (`text/event-stream`)
+    - Each `data:` event carries the next piece of the response
+    - A final `done` event carries the saved chat as JSON (`current_chat` + `total_chats`)
+    - An `error` event is sent if the AI service fails
+    - No TTS audio is generated for streamed responses
+    """
+    from app.services.gemini_service import gemini_service
+    
+    # Validate and process message before the stream starts
+    message_text = gemini_service.validate_and_process_message(message.strip())
+    user_id = current_user.id
+    
+    # The request session stays open until the stream ends; end its transaction now so
+    # its pooled connection isn't held idle for the whole Gemini stream
+    await db.commit()
+    
+    async def event_stream():
+        chunks = []
+        try:
+            async for text in gemini_service.stream_text_response(message_text):
+                chunks.append(text)
+                yield _sse_event(text)
+        except HTTPException as e:
+            yield _sse_event(str(e.detail), event="error")
+            return
+        
+        # Save complete response once the stream has finished, reusing the request
+        # session (it checks a connection out again only for this transaction)
+        chat_entry = ChatHistory(
+            user_id=user_id,
+            message=message_text,
+            response="".join(chunks),
+            message_type=MessageType.TEXT
+        )
+        db.add(chat_entry)
+        await db.flush()
+        total_chats = await _increment_chat_count(db, user_id)
+        await db.commit()
+        
+        yield _sse_event(json.dumps({
+            "current_chat": ChatMessageResponse.model_validate(chat_entry).model_dump(mode="json"),
+            "total_chats": total_chats
+        }), event="done")
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/voice", response_model=ChatMessageWithHistoryResponse, summary="Send Voice Message", description="Send a voice/audio message to the chatbot. Returns AI text response + audio response URL with chat history.")
 async def send_voice_message(
-    request: Request,
     voice: UploadFile = File(..., description="Audio file (mp3, wav, etc.) to send to the chatbot"),  # Required voice file
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    base_url: str = Depends(get_base_url)
 ):
     """
     **Send Voice Message to Chatbot**
@@ -124,36 +351,31 @@ async def send_voice_message(
     
     **Returns:** Current chat + previous chat history (last 20 chats) + audio response URL
     """
+    from app.services.gemini_service import gemini_service
     from app.services.speech_service import speech_service
 
     voice_file_path = None
     voice_url = None
 
     # Validate file type
-    if voice.content_type not in settings.ALLOWED_AUDIO_TYPES:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid file type. Allowed types: {', '.join(settings.ALLOWED_AUDIO_TYPES)}"
-        )
-
-    # Read and save voice file
-    contents = await voice.read()
-    if len(contents) > settings.MAX_UPLOAD_SIZE:
+    if voice.content_type not in settings.ALLOWED_AUDIO_TYPES_SET:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File too large. Maximum size: {settings.MAX_UPLOAD_SIZE / (1024*1024)}MB"
+            detail=INVALID_AUDIO_TYPE_DETAIL
         )
 
-    file_extension = voice.filename.split(".")[-1] if "." in voice.filename else "mp3"
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    voice_file_path = os.path.join(UPLOAD_DIR, unique_filename)
+    file_extension = _file_extension(voice.filename, "mp3")
+    unique_filename = f"{uuid.uuid4().hex}.{file_extension}"
+    voice_file_path = f"{UPLOAD_DIR}/{unique_filename}"
 
-    async with aiofiles.open(voice_file_path, "wb") as f:
-        await f.write(contents)
+    # Save voice file
+    await _save_upload(voice, voice_file_path, AUDIO_SIGNATURES)
 
     try:
-        # STT: Convert voice to text
-        message_text = await speech_service.convert_voice_to_text(voice_file_path)
+        # STT: Transcribe from the already-validated upload stream rather than
+        # reading the saved copy back from disk (the saved file backs voice_url)
+        voice.file.seek(0)
+        message_text = await speech_service.convert_voice_to_text(voice.file)
         
         # Validate STT result
         if not message_text or not message_text.strip():
@@ -163,7 +385,6 @@ async def send_voice_message(
             )
 
         # Generate voice URL
-        base_url = str(request.base_url).rstrip('/')
         voice_url = f"{base_url}/uploads/{unique_filename}"
 
         # Validate and process message
@@ -172,27 +393,11 @@ async def send_voice_message(
         # Generate AI response
         ai_response = await gemini_service.generate_text_response(message_text)
 
-        # TTS: Convert response to audio
-        response_audio_url = None
-        try:
-            response_audio_filename = f"{uuid.uuid4()}.mp3"
-            response_audio_path = os.path.join(UPLOAD_DIR, response_audio_filename)
-            
-            # Convert text to speech
-            await speech_service.convert_text_to_speech(ai_response, response_audio_path)
-            
-            # Generate full URL for the audio file
-            base_url = str(request.base_url).rstrip('/')
-            response_audio_url = f"{base_url}/uploads/{response_audio_filename}"
-            print(f"[DEBUG] TTS successful. response_audio_url: {response_audio_url}")
-        except HTTPException as e:
-            # Re-raise HTTP exceptions (like service not available)
-            print(f"[ERROR] TTS HTTPException: {str(e)}")
-            raise
-        except Exception as e:
-            # For other exceptions, continue without audio but log the error
-            print(f"[WARNING] TTS failed: {str(e)}. Continuing without audio.")
-            response_audio_url = None
+        # TTS: Convert response to audio while previous chat history loads
+        response_audio_url, previous_chats = await _with_previous_chats(
+            db, current_user.id,
+            _generate_response_audio(speech_service, ai_response, base_url)
+        )
 
         # Save to database
         chat_entry = ChatHistory(
@@ -205,22 +410,15 @@ async def send_voice_message(
         )
 
         db.add(chat_entry)
-        db.commit()
-        db.refresh(chat_entry)
+        # Flush runs INSERT ... RETURNING so id/created_at are populated without a refresh
+        await db.flush()
+        total_chats = await _increment_chat_count(db, current_user.id)
+        await db.commit()
         
-        # Debug: Verify response_audio_url is set
-        print(f"[DEBUG] Saved to DB - response_audio_url: {chat_entry.response_audio_url}, voice_url: {chat_entry.voice_url}")
-
-        # Get previous chat history (excluding current one, last 20 chats)
-        previous_chats = db.query(ChatHistory).filter(
-            ChatHistory.user_id == current_user.id,
-            ChatHistory.id != chat_entry.id
-        ).order_by(ChatHistory.created_at.desc()).limit(20).all()
-
-        # Get total chat count
-        total_chats = db.query(ChatHistory).filter(
-            ChatHistory.user_id == current_user.id
-        ).count()
+        logger.debug(
+            "Voice message saved - response_audio_url: %s, voice_url: %s",
+            chat_entry.response_audio_url, chat_entry.voice_url
+        )
 
         # Ensure response_audio_url is included in response
         response_data = {
@@ -229,10 +427,6 @@ async def send_voice_message(
             "total_chats": total_chats
         }
         
-        # Debug: Print response data to verify
-        print(f"[DEBUG] Voice response - current_chat.response_audio_url: {chat_entry.response_audio_url}")
-        print(f"[DEBUG] Voice response - current_chat.voice_url: {chat_entry.voice_url}")
-        
         return response_data
 
     except HTTPException:
@@ -240,11 +434,7 @@ async def send_voice_message(
         raise
     except Exception as e:
         # Clean up file if processing fails
-        if voice_file_path and os.path.exists(voice_file_path):
-            try:
-                os.remove(voice_file_path)
-            except:
-                pass
+        _remove_file_safe(voice_file_path)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing voice note: {str(e)}"
@@ -253,11 +443,11 @@ async def send_voice_message(
 
 @router.post("/upload-image", response_model=ChatMessageWithHistoryResponse)
 async def upload_image(
-    request: Request,
     message: str = Form(...),
     image: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    base_url: str = Depends(get_base_url)
 ):
     """
     Upload an image with a text message
@@ -265,39 +455,34 @@ async def upload_image(
     Returns current chat + previous chat history
     The AI will analyze the image and respond based on the message
     """
+    from app.services.gemini_service import gemini_service
+    
     # Validate message
     message = gemini_service.validate_and_process_message(message)
     
     # Validate file type
-    if image.content_type not in settings.ALLOWED_IMAGE_TYPES:
+    if image.content_type not in settings.ALLOWED_IMAGE_TYPES_SET:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid file type. Allowed types: {', '.join(settings.ALLOWED_IMAGE_TYPES)}"
-        )
-    
-    # Validate file size
-    contents = await image.read()
-    if len(contents) > settings.MAX_UPLOAD_SIZE:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File too large. Maximum size: {settings.MAX_UPLOAD_SIZE / (1024*1024)}MB"
+            detail=INVALID_IMAGE_TYPE_DETAIL
         )
     
     # Generate unique filename
-    file_extension = image.filename.split(".")[-1]
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = os.path.join(UPLOAD_DIR, unique_filename)
+    file_extension = _file_extension(image.filename, "bin")
+    unique_filename = f"{uuid.uuid4().hex}.{file_extension}"
+    file_path = f"{UPLOAD_DIR}/{unique_filename}"
     
     # Save file
-    async with aiofiles.open(file_path, "wb") as f:
-        await f.write(contents)
+    await _save_upload(image, file_path, IMAGE_SIGNATURES)
     
     try:
-        # Generate AI response with image
-        ai_response = await gemini_service.generate_image_response(message, file_path)
+        # Generate AI response with image while previous chat history loads
+        ai_response, previous_chats = await _with_previous_chats(
+            db, current_user.id,
+            gemini_service.generate_image_response(message, file_path)
+        )
         
         # Generate full URL for image (works for local and production)
-        base_url = str(request.base_url).rstrip('/')
         full_image_url = f"{base_url}/uploads/{unique_filename}"
         
         # Save to database with full URL
@@ -310,19 +495,10 @@ async def upload_image(
         )
         
         db.add(chat_entry)
-        db.commit()
-        db.refresh(chat_entry)
-        
-        # Get previous chat history (excluding current one, last 20 chats)
-        previous_chats = db.query(ChatHistory).filter(
-            ChatHistory.user_id == current_user.id,
-            ChatHistory.id != chat_entry.id
-        ).order_by(ChatHistory.created_at.desc()).limit(20).all()
-        
-        # Get total chat count
-        total_chats = db.query(ChatHistory).filter(
-            ChatHistory.user_id == current_user.id
-        ).count()
+        # Flush runs INSERT ... RETURNING so id/created_at are populated without a refresh
+        await db.flush()
+        total_chats = await _increment_chat_count(db, current_user.id)
+        await db.commit()
         
         return {
             "current_chat": chat_entry,
@@ -332,26 +508,19 @@ async def upload_image(
     
     except Exception as e:
         # Clean up file if processing fails
-        if os.path.exists(file_path):
-            try:
-                # Try to remove file, but don't fail if it's locked
-                os.remove(file_path)
-            except PermissionError:
-                # File is locked by another process (Pillow), skip deletion
-                # File will be cleaned up later or on server restart
-                print(f"⚠️ Could not delete file {file_path} - file in use")
-                pass
-            except Exception as del_error:
-                print(f"⚠️ Error deleting file: {str(del_error)}")
-                pass
+        # (a file locked by another process is logged and left for later cleanup)
+        _remove_file_safe(file_path)
         raise e
 
 
 @router.get("/history", response_model=List[ChatHistoryResponse])
 async def get_chat_history(
-    skip: int = 0,
-    limit: int = 50,
-    db: Session = Depends(get_db),
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=100),
+    cursor_created_at: Optional[datetime] = None,
+    cursor_id: Optional[UUID] = None,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -359,17 +528,48 @@ async def get_chat_history(
     
     Returns most recent chats first (ordered by created_at DESC)
     
-    - **skip**: Number of records to skip (default: 0)
-    - **limit**: Maximum number of records to return (default: 50, max: 100)
+    - **skip**: Number of records to skip (default: 0, ignored when a cursor is given)
+    - **limit**: Maximum number of records to return (default: 50, 1-100)
+    - **cursor_created_at** / **cursor_id**: Keyset cursor from the previous page
+      (returned in the `X-Next-Cursor-Created-At` / `X-Next-Cursor-Id` headers);
+      both must be given together
     """
-    if limit > 100:
-        limit = 100
+    # A half cursor would silently fall back to page 1
+    if (cursor_created_at is None) != (cursor_id is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="cursor_created_at and cursor_id must be provided together"
+        )
     
-    chats = db.query(ChatHistory).filter(
+    query = select(ChatHistory).where(
         ChatHistory.user_id == current_user.id
     ).order_by(
-        ChatHistory.created_at.desc()
-    ).offset(skip).limit(limit).all()
+        ChatHistory.created_at.desc(),
+        ChatHistory.id.desc()
+    )
+    
+    if cursor_id is not None:
+        # Keyset pagination: seek past the last seen row instead of scanning OFFSET rows
+        query = query.where(
+            or_(
+                ChatHistory.created_at < cursor_created_at,
+                and_(
+                    ChatHistory.created_at == cursor_created_at,
+                    ChatHistory.id < cursor_id
+                )
+            )
+        )
+    elif skip:
+        query = query.offset(skip)
+    
+    result = await db.execute(query.limit(limit))
+    chats = result.scalars().all()
+    
+    # Cursor for the next page (only when this page is full)
+    if len(chats) == limit:
+        last_chat = chats[-1]
+        response.headers["X-Next-Cursor-Created-At"] = last_chat.created_at.isoformat()
+        response.headers["X-Next-Cursor-Id"] = str(last_chat.id)
     
     return chats
 
@@ -377,16 +577,13 @@ async def get_chat_history(
 @router.get("/history/{chat_id}", response_model=ChatHistoryResponse)
 async def get_chat_by_id(
     chat_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Get specific chat by ID
     """
-    chat = db.query(ChatHistory).filter(
-        ChatHistory.id == chat_id,
-        ChatHistory.user_id == current_user.id
-    ).first()
+    chat = await _get_user_chat(db, chat_id, current_user.id)
     
     if not chat:
         raise HTTPException(
@@ -400,16 +597,14 @@ async def get_chat_by_id(
 @router.delete("/history/{chat_id}")
 async def delete_chat(
     chat_id: str,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Delete specific chat
     """
-    chat = db.query(ChatHistory).filter(
-        ChatHistory.id == chat_id,
-        ChatHistory.user_id == current_user.id
-    ).first()
+    chat = await _get_user_chat(db, chat_id, current_user.id)
     
     if not chat:
         raise HTTPException(
@@ -417,49 +612,56 @@ async def delete_chat(
             detail="Chat not found"
         )
     
-    # Delete associated image file if exists
-    if chat.image_url:
-        filename = chat.image_url.split("/")[-1]
-        file_path = os.path.join(UPLOAD_DIR, filename)
-        if os.path.exists(file_path):
-            os.remove(file_path)
+    await db.delete(chat)
+    await db.execute(
+        update(User)
+        .where(User.id == current_user.id)
+        .values(chat_count=User.chat_count - 1)
+    )
+    await db.commit()
     
-    db.delete(chat)
-    db.commit()
+    # Delete associated image file after the response is sent (removal is idempotent)
+    if chat.image_url:
+        filename = chat.image_url.rsplit("/", 1)[-1]
+        background_tasks.add_task(_remove_file_safe, f"{UPLOAD_DIR}/{filename}")
     
     return {"message": "Chat deleted successfully"}
 
 
 @router.delete("/history")
 async def delete_all_chats(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Delete all chat history for current user
     """
-    # Get all user's chats
-    chats = db.query(ChatHistory).filter(
-        ChatHistory.user_id == current_user.id
-    ).all()
-    
-    # Delete associated image files
-    for chat in chats:
-        if chat.image_url:
-            filename = chat.image_url.split("/")[-1]
-            file_path = os.path.join(UPLOAD_DIR, filename)
-            if os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                except:
-                    pass  # Continue even if file deletion fails
-    
-    # Delete all chats
-    db.query(ChatHistory).filter(
-        ChatHistory.user_id == current_user.id
-    ).delete()
+    # Get image URLs only (no need to load full chat rows)
+    result = await db.execute(
+        select(ChatHistory.image_url).where(
+            ChatHistory.user_id == current_user.id,
+            ChatHistory.image_url.isnot(None)
+        )
+    )
+    image_urls = result.scalars().all()
+    
+    # Delete associated image files in one worker thread (off the event loop)
+    file_paths = [f"{UPLOAD_DIR}/{image_url.rsplit('/', 1)[-1]}" for image_url in image_urls]
+    await asyncio.to_thread(_purge_files, file_paths)
+    
+    # Delete all chats in a single bulk statement
+    result = await db.execute(
+        delete(ChatHistory).where(
+            ChatHistory.user_id == current_user.id
+        ).execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        update(User)
+        .where(User.id == current_user.id)
+        .values(chat_count=0)
+    )
     
-    db.commit()
+    await db.commit()
     
-    return {"message": f"Deleted {len(chats)} chat(s) successfully"}
+    return {"message": f"Deleted {result.rowcount} chat(s) successfully"}
 
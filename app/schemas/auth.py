@@ -1,17 +1,10 @@
-from pydantic import BaseModel, EmailStr, Field, field_validator # type: ignore
+from pydantic import BaseModel, Field # type: ignore
+from app.schemas.user import NormalizedEmail
 
 
 class LoginRequest(BaseModel):
-    email: EmailStr
+    email: NormalizedEmail
     password: str
-    
-    @field_validator('email', mode='before')
-    @classmethod
-    def normalize_email(cls, v):
-        """Convert email to lowercase for consistent login"""
-        if isinstance(v, str):
-            return v.lower().strip()
-        return v
 
 
 class TokenResponse(BaseModel):
@@ -26,15 +19,7 @@ class LoginResponse(BaseModel):
 
 
 class ForgotPasswordRequest(BaseModel):
-    email: EmailStr
-    
-    @field_validator('email', mode='before')
-    @classmethod
-    def normalize_email(cls, v):
-        """Convert email to lowercase"""
-        if isinstance(v, str):
-            return v.lower().strip()
-        return v
+    email: NormalizedEmail
 
 
 class ResetPasswordRequest(BaseModel):
@@ -20,7 +20,8 @@ class ChatMessageResponse(BaseModel):
     
     model_config = ConfigDict(
         from_attributes=True,
-        protected_namespaces=()
+        protected_namespaces=(),
+        frozen=True  # Response models are built once and only serialized; reject accidental mutation
     )
 
 
@@ -37,7 +38,8 @@ class ChatHistoryResponse(BaseModel):
     
     model_config = ConfigDict(
         from_attributes=True,
-        protected_namespaces=()
+        protected_namespaces=(),
+        frozen=True
     )
 
 
@@ -49,6 +51,7 @@ class ChatMessageWithHistoryResponse(BaseModel):
     
     model_config = ConfigDict(
         from_attributes=True,
-        protected_namespaces=()
+        protected_namespaces=(),
+        frozen=True
     )
 
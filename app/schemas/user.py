@@ -1,29 +1,34 @@
-from pydantic import BaseModel, EmailStr, Field, field_validator # type: ignore
+from pydantic import BaseModel, EmailStr, Field, BeforeValidator # type: ignore
 from datetime import datetime
 from uuid import UUID
+from typing import Annotated
+
+
+def _normalize_email(v):
+    """Convert email to lowercase"""
+    if isinstance(v, str):
+        return v.lower().strip()
+    return v
+
+
+def _trim(v):
+    """Trim surrounding whitespace"""
+    if isinstance(v, str):
+        return v.strip()
+    return v
+
+
+# Plain before-validators attached via Annotated are compiled into the field's
+# core schema, avoiding a classmethod validator dispatch per field
+NormalizedEmail = Annotated[EmailStr, BeforeValidator(_normalize_email)]
+TrimmedName = Annotated[str, BeforeValidator(_trim)]
 
 
 class UserBase(BaseModel):
-    email: EmailStr
+    email: NormalizedEmail
     username: str = Field(..., min_length=3, max_length=50)
-    first_name: str = Field(..., min_length=2, max_length=50)
-    last_name: str = Field(..., min_length=2, max_length=50)
-    
-    @field_validator('email', mode='before')
-    @classmethod
-    def normalize_email(cls, v):
-        """Convert email to lowercase"""
-        if isinstance(v, str):
-            return v.lower().strip()
-        return v
-    
-    @field_validator('first_name', 'last_name', mode='before')
-    @classmethod
-    def trim_names(cls, v):
-        """Trim whitespace from names"""
-        if isinstance(v, str):
-            return v.strip()
-        return v
+    first_name: TrimmedName = Field(..., min_length=2, max_length=50)
+    last_name: TrimmedName = Field(..., min_length=2, max_length=50)
 
 
 class UserCreate(UserBase):
@@ -32,25 +37,9 @@ class UserCreate(UserBase):
 
 class UserUpdate(BaseModel):
     username: str | None = Field(None, min_length=3, max_length=50)
-    email: EmailStr | None = None
-    first_name: str | None = Field(None, min_length=2, max_length=50)
-    last_name: str | None = Field(None, min_length=2, max_length=50)
-    
-    @field_validator('email', mode='before')
-    @classmethod
-    def normalize_email(cls, v):
-        """Convert email to lowercase"""
-        if v and isinstance(v, str):
-            return v.lower().strip()
-        return v
-    
-    @field_validator('first_name', 'last_name', mode='before')
-    @classmethod
-    def trim_names(cls, v):
-        """Trim whitespace from names"""
-        if v and isinstance(v, str):
-            return v.strip()
-        return v
+    email: NormalizedEmail | None = None
+    first_name: TrimmedName | None = Field(None, min_length=2, max_length=50)
+    last_name: TrimmedName | None = Field(None, min_length=2, max_length=50)
 
 
 class UserResponse(UserBase):
@@ -1,11 +1,12 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status # type: ignore
 from app.models.user import User
 from app.models.chat import PasswordResetToken
 from app.schemas.user import UserCreate
 from app.utils.security import (
-    get_password_hash,
-    verify_password,
+    get_password_hash_async,
+    verify_password_async,
     create_access_token,
     generate_reset_token,
     create_reset_token_expiry
@@ -16,7 +17,7 @@ from datetime import datetime, timedelta, timezone
 
 class AuthService:
     @staticmethod
-    def register_user(db: Session, user_data: UserCreate) -> User:
+    async def register_user(db: AsyncSession, user_data: UserCreate) -> User:
         """Register a new user"""
         # Validate username
         validate_username(user_data.username)
@@ -25,21 +26,23 @@ class AuthService:
         validate_password_strength(user_data.password)
         
         # Check if email already exists
-        if db.query(User).filter(User.email == user_data.email).first():
+        result = await db.execute(select(User.id).where(User.email == user_data.email))
+        if result.first():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
             )
         
         # Check if username already exists
-        if db.query(User).filter(User.username == user_data.username).first():
+        result = await db.execute(select(User.id).where(User.username == user_data.username))
+        if result.first():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Username already taken"
             )
         
         # Create new user
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await get_password_hash_async(user_data.password)
         new_user = User(
             email=user_data.email,
             username=user_data.username,
@@ -49,15 +52,15 @@ class AuthService:
         )
         
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
         
         return new_user
     
     @staticmethod
-    def authenticate_user(db: Session, email: str, password: str) -> User:
+    async def authenticate_user(db: AsyncSession, email: str, password: str) -> User:
         """Authenticate user with email and password"""
-        user = db.query(User).filter(User.email == email).first()
+        result = await db.execute(select(User).where(User.email == email))
+        user = result.scalars().first()
         
         if not user:
             raise HTTPException(
@@ -65,7 +68,7 @@ class AuthService:
                 detail="Incorrect email or password"
             )
         
-        if not verify_password(password, user.hashed_password):
+        if not await verify_password_async(password, user.hashed_password):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password"
@@ -84,9 +87,10 @@ class AuthService:
         return access_token
     
     @staticmethod
-    def create_password_reset_token(db: Session, email: str) -> tuple[User, str]:
+    async def create_password_reset_token(db: AsyncSession, email: str) -> tuple[User, str]:
         """Create password reset token"""
-        user = db.query(User).filter(User.email == email).first()
+        result = await db.execute(select(User).where(User.email == email))
+        user = result.scalars().first()
         
         if not user:
             raise HTTPException(
@@ -106,20 +110,21 @@ class AuthService:
         )
         
         db.add(reset_token)
-        db.commit()
+        await db.commit()
         
         return user, token
     
     @staticmethod
-    def reset_password(db: Session, token: str, new_password: str) -> None:
+    async def reset_password(db: AsyncSession, token: str, new_password: str) -> None:
         """Reset user password with token"""
         # Validate password strength
         validate_password_strength(new_password)
         
         # Find token
-        reset_token = db.query(PasswordResetToken).filter(
-            PasswordResetToken.token == token
-        ).first()
+        result = await db.execute(
+            select(PasswordResetToken).where(PasswordResetToken.token == token)
+        )
+        reset_token = result.scalars().first()
         
         if not reset_token:
             raise HTTPException(
@@ -142,7 +147,7 @@ class AuthService:
             )
         
         # Get user
-        user = db.query(User).filter(User.id == reset_token.user_id).first()
+        user = await db.get(User, reset_token.user_id)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -150,10 +155,10 @@ class AuthService:
             )
         
         # Update password
-        user.hashed_password = get_password_hash(new_password)
+        user.hashed_password = await get_password_hash_async(new_password)
         
         # Mark token as used
         reset_token.is_used = True
         
-        db.commit()
+        await db.commit()
 
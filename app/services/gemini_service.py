@@ -1,9 +1,17 @@
 import google.generativeai as genai # type: ignore
 import asyncio
+import logging
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TTLCache # type: ignore
 from app.config import settings
-from fastapi import HTTPException, status # type: ignore    
-import os
-from PIL import Image # type: ignore
+from fastapi import HTTPException, status # type: ignore
+import io
+
+# Setup logger
+logger = logging.getLogger(__name__)
 
 # Configure Gemini API
 genai.configure(api_key=settings.GEMINI_API_KEY)
@@ -12,236 +20,355 @@ genai.configure(api_key=settings.GEMINI_API_KEY)
 GEMINI_TIMEOUT = 60  # 60 seconds timeout instead of 600
 MAX_RETRIES = 2  # Retry up to 2 times for network errors
 RETRY_DELAY = 1  # Initial delay between retries in seconds
+RETRY_MAX_DELAY = 8  # Cap on a single backoff sleep in seconds
+
+# Error messages that indicate a retryable network/connection failure
+NETWORK_ERROR_RE = re.compile(
+    r"503|failed to connect|socket|connection|timeout|unreachable|dns|network",
+    re.IGNORECASE
+)
+
+# Dedicated thread pool and concurrency gate for blocking Gemini calls, so a burst
+# of chat requests can't exhaust the default executor used by other blocking I/O
+GEMINI_EXECUTOR = ThreadPoolExecutor(max_workers=settings.GEMINI_MAX_CONCURRENCY, thread_name_prefix="gemini")
+GEMINI_SEMAPHORE = asyncio.Semaphore(settings.GEMINI_MAX_CONCURRENCY)
+
+
+class _TokenBucket:
+    """Async token bucket allowing `rate` acquisitions per `per` seconds"""
+
+    def __init__(self, rate: int, per: float):
+        self._rate = rate
+        self._per = per
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # Waiters queue on the lock, so tokens are handed out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self._rate, self._tokens + (now - self._updated) * self._rate / self._per)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) * self._per / self._rate)
+
+
+# Paces requests to the Gemini quota before dispatch instead of burning retries on 429s
+GEMINI_RATE_LIMITER = _TokenBucket(settings.GEMINI_RPM, 60) if settings.GEMINI_RPM > 0 else None
+
+
+async def _acquire_gemini_request():
+    """Wait for a request slot under GEMINI_RPM (no-op when rate limiting is disabled)"""
+    if GEMINI_RATE_LIMITER:
+        await GEMINI_RATE_LIMITER.acquire()
+
+
+def _release_slot_threadsafe(loop: asyncio.AbstractEventLoop) -> None:
+    """Give a GEMINI_SEMAPHORE slot back from the worker thread that held it"""
+    try:
+        loop.call_soon_threadsafe(GEMINI_SEMAPHORE.release)
+    except RuntimeError:
+        pass  # Loop already closed (shutdown)
+
+
+async def _run_gemini_call(sync_fn, *args):
+    """
+    Run a blocking Gemini call on the Gemini thread pool with GEMINI_TIMEOUT
+    The slot is held until the worker thread actually finishes (a timed-out call
+    keeps running), so every admitted call gets a free worker and the timeout
+    never includes time spent queued in GEMINI_EXECUTOR
+    """
+    await GEMINI_SEMAPHORE.acquire()
+    loop = asyncio.get_running_loop()
+    try:
+        future = GEMINI_EXECUTOR.submit(sync_fn, *args)
+    except BaseException:
+        GEMINI_SEMAPHORE.release()
+        raise
+    future.add_done_callback(lambda _: _release_slot_threadsafe(loop))
+    return await asyncio.wait_for(asyncio.wrap_future(future, loop=loop), timeout=GEMINI_TIMEOUT)
+
+
+def _retry_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff: a random sleep up to RETRY_DELAY * 2^attempt"""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_DELAY * 2 ** attempt))
+
+
+# Static bilingual (English / Roman Urdu) instructions prepended to every text prompt
+TEXT_PROMPT_PREFIX = """You are a helpful bilingual assistant. 
+        IMPORTANT: If user writes in Roman Urdu (Urdu in English letters like 'kasay ho'), provide your response in BOTH formats:
+        1. First in Urdu script (اردو): میں ٹھیک ہوں
+        2. Then in Roman Urdu: (Main theek hoon)
+        If user writes in English, reply only in English."""
+
+# Generation config shared by text and image requests (built once, passed by reference)
+# Optimized config with higher token limit for complete responses
+GENERATION_CONFIG = {
+    "temperature": 1.0,
+    "max_output_tokens": 2048,
+    "top_p": 0.95,
+    "top_k": 64
+}
+
+# Safety settings - Allow most content
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+]
+
+
+# Recent text responses keyed by the exact message, so repeated prompts
+# ("hi", suggested questions) skip the Gemini round trip and quota.
+# Shared across users: prompts carry no per-user context, so the same message
+# gets an equivalent answer for anyone; personal/time-sensitive ones are skipped
+RESPONSE_CACHE_TTL = 300  # seconds
+RESPONSE_CACHE_MIN_LENGTH = 3  # Don't cache one- or two-character messages
+_response_cache: TTLCache = TTLCache(maxsize=512, ttl=RESPONSE_CACHE_TTL)
+
+# Messages with timestamps / relative dates or introductions are never served from cache
+UNCACHEABLE_RE = re.compile(
+    r"\d{1,2}:\d{2}"                        # 10:30
+    r"|\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}"      # 2024-01-31, 31/01/24
+    r"|\b(?:today|tonight|tomorrow|yesterday|now|aaj|kal|abhi)\b"
+    r"|\b(?:my name is|i am|i'm|mera naam|call me)\b",
+    re.IGNORECASE
+)
+# A capitalised word mid-sentence (after a lowercase word or comma) is likely a name
+NAME_RE = re.compile(r"(?<=[a-z,;:] )[A-Z][a-z]+")
+
+
+def _is_cacheable(message: str) -> bool:
+    """Only generic prompts are cached; short, time-sensitive or name-bearing ones go to Gemini"""
+    return (
+        len(message) >= RESPONSE_CACHE_MIN_LENGTH
+        and not UNCACHEABLE_RE.search(message)
+        and not NAME_RE.search(message)
+    )
+
+
+# Images larger than this are downscaled to IMAGE_MAX_EDGE and re-encoded as JPEG
+IMAGE_DOWNSCALE_THRESHOLD = 512 * 1024  # 512KB
+IMAGE_MAX_EDGE = 1024  # pixels
+
+
+def _downscale_image(data: bytes) -> bytes:
+    """Shrink an image to fit IMAGE_MAX_EDGE and return it as JPEG bytes"""
+    from PIL import Image, ImageOps # type: ignore
+
+    with Image.open(io.BytesIO(data)) as source:
+        # Re-encoding drops EXIF, so apply the Orientation tag to the pixels first
+        image = ImageOps.exif_transpose(source)
+        image.thumbnail((IMAGE_MAX_EDGE, IMAGE_MAX_EDGE), Image.Resampling.LANCZOS)
+        if image.mode != "RGB":
+            image = image.convert("RGB")  # JPEG has no alpha/palette
+        buf = io.BytesIO()
+        image.save(buf, format="JPEG", quality=85, optimize=True)
+    return buf.getvalue()
+
+
+def _inline_image_mime_type(data: bytes) -> str | None:
+    """MIME type for image bytes Gemini accepts as-is (JPEG/PNG/WebP), sniffed from the header"""
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
 
 
 class GeminiService:
     def __init__(self):
         # Use most stable working models for free tier
         # gemini-1.5-flash-latest is the current working free model
-        self.text_model = genai.GenerativeModel('gemini-2.5-flash')
-        self.vision_model = genai.GenerativeModel('gemini-2.5-flash')
-    
+        # One model instance serves both text and vision requests
+        self.model = genai.GenerativeModel('gemini-2.5-flash')
+        self.text_model = self.model
+        self.vision_model = self.model
+
+    def _build_text_prompt(self, message: str) -> str:
+        """Build bilingual (English / Roman Urdu) prompt for a text message"""
+        return f"{TEXT_PROMPT_PREFIX}\nUser: {message}"
+
     def _generate_text_content_sync(self, message: str) -> str:
         """Synchronous Gemini API call - runs in thread pool to avoid blocking event loop"""
-        prompt = f"""You are a helpful bilingual assistant. 
-        IMPORTANT: If user writes in Roman Urdu (Urdu in English letters like 'kasay ho'), provide your response in BOTH formats:
-        1. First in Urdu script (اردو): میں ٹھیک ہوں
-        2. Then in Roman Urdu: (Main theek hoon)
-        If user writes in English, reply only in English."""
-        prompt += f"\nUser: {message}"
-        
-        # Optimized config with higher token limit
-        generation_config = {
-            "temperature": 1.0,
-            "max_output_tokens": 2048,  # Higher limit for complete responses
-            "top_p": 0.95,
-            "top_k": 64
-        }
-        
-        # Safety settings - Allow most content
-        safety_settings = [
-            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-        ]
-        
-        response = self.text_model.generate_content(
-            prompt,
-            generation_config=generation_config,
-            safety_settings=safety_settings
+        response = self.model.generate_content(
+            self._build_text_prompt(message),
+            generation_config=GENERATION_CONFIG,
+            safety_settings=SAFETY_SETTINGS
         )
-        
+
         if not response or not response.text:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to generate response from AI"
             )
-        
+
         return response.text
-    
-    async def generate_text_response(self, message: str) -> str:
+
+    async def _call_with_retry(self, sync_fn, *args, error_detail: str) -> str:
         """
-        Generate response for text message - Optimized for speed
-        Supports English and Roman Urdu
+        Run a blocking Gemini call in the thread pool with a timeout
+        Timeouts and network errors are retried with full-jitter exponential backoff
+        so concurrent requests don't retry in lockstep during an outage
         """
-        last_error = None
-        
-        # Retry logic for network errors
         for attempt in range(MAX_RETRIES + 1):
             try:
                 # Run blocking Gemini API call in thread pool with timeout
-                loop = asyncio.get_event_loop()
-                result = await asyncio.wait_for(
-                    loop.run_in_executor(None, self._generate_text_content_sync, message),
-                    timeout=GEMINI_TIMEOUT
-                )
-                return result
-                
+                await _acquire_gemini_request()
+                return await _run_gemini_call(sync_fn, *args)
+
             except asyncio.TimeoutError:
-                error_msg = f"Gemini API timeout after {GEMINI_TIMEOUT}s"
-                print(f"[ERROR] {error_msg} (attempt {attempt + 1}/{MAX_RETRIES + 1})")
-                last_error = HTTPException(
+                logger.error("Gemini API timeout after %ss (attempt %d/%d)", GEMINI_TIMEOUT, attempt + 1, MAX_RETRIES + 1)
+                if attempt < MAX_RETRIES:
+                    await asyncio.sleep(_retry_delay(attempt))
+                    continue
+                raise HTTPException(
                     status_code=status.HTTP_504_GATEWAY_TIMEOUT,
                     detail="AI service timeout. Please try again."
                 )
-                if attempt < MAX_RETRIES:
-                    await asyncio.sleep(RETRY_DELAY * (attempt + 1))
-                    continue
-                raise last_error
-                
-            except HTTPException as e:
-                # Re-raise HTTPException immediately, don't retry
-                raise e
+
+            except HTTPException:
+                # Re-raise HTTPException immediately, don't retry or classify
+                raise
             except Exception as e:
-                error_str = str(e).lower()
                 # Check if it's a network/connection error (but not HTTPException)
-                is_network_error = any(keyword in error_str for keyword in [
-                    '503', 'failed to connect', 'socket', 'connection', 
-                    'timeout', 'unreachable', 'dns', 'network', 'failed to connect to all addresses'
-                ])
-                
+                error_str = str(e)
+                error_text = error_str[:200]
+                is_network_error = NETWORK_ERROR_RE.search(error_str) is not None
+
                 if is_network_error and attempt < MAX_RETRIES:
-                    print(f"[WARNING] Network error (attempt {attempt + 1}/{MAX_RETRIES + 1}): {str(e)[:200]}")
-                    await asyncio.sleep(RETRY_DELAY * (attempt + 1))
-                    last_error = e
+                    logger.warning("Network error (attempt %d/%d): %s", attempt + 1, MAX_RETRIES + 1, error_text)
+                    await asyncio.sleep(_retry_delay(attempt))
                     continue
-                else:
-                    # Non-retryable error or max retries reached
-                    print(f"[ERROR] Error generating text response: {str(e)[:200]}")
-                    raise HTTPException(
-                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                        detail=f"Failed to generate AI response: {str(e)[:200]}"
-                    )
-        
-        # If we exhausted retries
-        if last_error:
-            if isinstance(last_error, HTTPException):
-                raise last_error
+                # Non-retryable error or max retries reached
+                logger.error("%s: %s", error_detail, error_text)
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"{error_detail}: {error_text}"
+                ) from e
+
+    async def generate_text_response(self, message: str) -> str:
+        """
+        Generate response for text message - Optimized for speed
+        Supports English and Roman Urdu
+        """
+        cacheable = _is_cacheable(message)
+        if cacheable and message in _response_cache:
+            return _response_cache[message]
+
+        result = await self._call_with_retry(
+            self._generate_text_content_sync, message,
+            error_detail="Failed to generate AI response"
+        )
+        if cacheable:
+            _response_cache[message] = result
+        return result
+
+    def _start_text_stream_sync(self, message: str):
+        """Start a streaming Gemini API call - runs in thread pool to avoid blocking event loop"""
+        response = self.model.generate_content(
+            self._build_text_prompt(message),
+            stream=True,
+            generation_config=GENERATION_CONFIG,
+            safety_settings=SAFETY_SETTINGS
+        )
+        return iter(response)
+
+    @staticmethod
+    def _next_chunk_text_sync(chunks) -> str | None:
+        """Read the next streamed chunk's text (None when the stream is finished)"""
+        for chunk in chunks:
+            if chunk.text:
+                return chunk.text
+        return None
+
+    async def stream_text_response(self, message: str):
+        """
+        Stream response for text message chunk by chunk as Gemini generates it
+        Supports English and Roman Urdu
+        """
+        try:
+            await _acquire_gemini_request()
+            chunks = await _run_gemini_call(self._start_text_stream_sync, message)
+            while True:
+                # Each chunk read is a blocking network read, so keep it off the event loop
+                text = await _run_gemini_call(self._next_chunk_text_sync, chunks)
+                if text is None:
+                    break
+                yield text
+        except asyncio.TimeoutError:
+            logger.error("Gemini API stream timeout after %ss", GEMINI_TIMEOUT)
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="AI service timeout. Please try again."
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error("Error streaming text response: %s", str(e)[:200])
             raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="AI service temporarily unavailable. Please try again in a moment."
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to generate AI response: {str(e)[:200]}"
             )
-    
+
     def _generate_image_content_sync(self, message: str, image_path: str) -> str:
         """Synchronous Gemini vision API call - runs in thread pool to avoid blocking event loop"""
-        image = None
+        # Read the encoded image bytes
         try:
-            # Open and validate image
-            if not os.path.exists(image_path):
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Image file not found"
-                )
-            
-            # Open image
-            image = Image.open(image_path)
-            
-            # Simple direct prompt
-            prompt = message
-            
-            # Optimized config with higher token limit
-            generation_config = {
-                "temperature": 1.0,
-                "max_output_tokens": 2048,
-                "top_p": 0.95,
-                "top_k": 64
-            }
-            
-            # Safety settings - Allow most content
-            safety_settings = [
-                {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-            ]
-            
-            # Generate response with image
-            response = self.vision_model.generate_content(
-                [prompt, image],
-                generation_config=generation_config,
-                safety_settings=safety_settings
+            with open(image_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Image file not found"
             )
-            
-            # IMPORTANT: Close image file immediately after use
-            if image:
-                image.close()
-            
-            if not response or not response.text:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Failed to generate response from AI"
-                )
-            
-            return response.text
-        except Exception:
-            # Make sure to close image on error too
-            if image:
-                try:
-                    image.close()
-                except:
-                    pass  # Ignore close errors
-            raise
-    
+
+        mime_type = _inline_image_mime_type(data)
+        if len(data) > IMAGE_DOWNSCALE_THRESHOLD:
+            # Large photos: shrink before upload to cut request bytes and image tokens
+            image_part = {"mime_type": "image/jpeg", "data": _downscale_image(data)}
+        elif mime_type:
+            # Send JPEG/PNG/WebP bytes as-is instead of decoding them to pixels with PIL
+            image_part = {"mime_type": mime_type, "data": data}
+        else:
+            # Other formats (e.g. GIF) are converted by the SDK from a PIL image
+            from PIL import Image # type: ignore
+            image_part = Image.open(io.BytesIO(data))
+
+        # Simple direct prompt
+        prompt = message
+
+        # Generate response with image
+        response = self.model.generate_content(
+            [prompt, image_part],
+            generation_config=GENERATION_CONFIG,
+            safety_settings=SAFETY_SETTINGS
+        )
+
+        if not response or not response.text:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to generate response from AI"
+            )
+
+        return response.text
+
     async def generate_image_response(self, message: str, image_path: str) -> str:
         """
         Generate response for image with text prompt - Optimized
         """
-        last_error = None
-        
-        # Retry logic for network errors
-        for attempt in range(MAX_RETRIES + 1):
-            try:
-                # Run blocking Gemini API call in thread pool with timeout
-                loop = asyncio.get_event_loop()
-                result = await asyncio.wait_for(
-                    loop.run_in_executor(None, self._generate_image_content_sync, message, image_path),
-                    timeout=GEMINI_TIMEOUT
-                )
-                return result
-                
-            except asyncio.TimeoutError:
-                error_msg = f"Gemini API timeout after {GEMINI_TIMEOUT}s"
-                print(f"[ERROR] {error_msg} (attempt {attempt + 1}/{MAX_RETRIES + 1})")
-                last_error = HTTPException(
-                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                    detail="AI service timeout. Please try again."
-                )
-                if attempt < MAX_RETRIES:
-                    await asyncio.sleep(RETRY_DELAY * (attempt + 1))
-                    continue
-                raise last_error
-                
-            except HTTPException as e:
-                # Re-raise HTTPException immediately, don't retry
-                raise e
-            except Exception as e:
-                error_str = str(e).lower()
-                is_network_error = any(keyword in error_str for keyword in [
-                    '503', 'failed to connect', 'socket', 'connection', 
-                    'timeout', 'unreachable', 'dns', 'network', 'failed to connect to all addresses'
-                ])
-                
-                if is_network_error and attempt < MAX_RETRIES:
-                    print(f"[WARNING] Network error (attempt {attempt + 1}/{MAX_RETRIES + 1}): {str(e)[:200]}")
-                    await asyncio.sleep(RETRY_DELAY * (attempt + 1))
-                    last_error = e
-                    continue
-                else:
-                    print(f"[ERROR] Error generating image response: {str(e)[:200]}")
-                    raise HTTPException(
-                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                        detail=f"Failed to generate AI response for image: {str(e)[:200]}"
-                    )
-        
-        if last_error:
-            if isinstance(last_error, HTTPException):
-                raise last_error
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="AI service temporarily unavailable. Please try again in a moment."
-            )
-    
+        return await self._call_with_retry(
+            self._generate_image_content_sync, message, image_path,
+            error_detail="Failed to generate AI response for image"
+        )
+
     def validate_and_process_message(self, message: str) -> str:
         """
         Validate and process user message
@@ -251,14 +378,14 @@ class GeminiService:
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Message cannot be empty"
             )
-        
+
         # Limit message length
         if len(message) > 5000:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Message is too long. Maximum 5000 characters allowed."
             )
-        
+
         return message.strip()
 
 
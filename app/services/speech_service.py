@@ -1,50 +1,161 @@
 import os
+import re
 import asyncio
+import logging
+import shutil
+import tempfile
+import threading
+from typing import BinaryIO, Union
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import HTTPException, status
-from app.config import get_settings  # import your Pydantic settings
+from app.config import settings
+
+logger = logging.getLogger(__name__)
 
 # Constants for timeout
 TTS_TIMEOUT = 30  # 30 seconds timeout for TTS
 STT_TIMEOUT = 60  # 60 seconds timeout for STT
 
+# Error details shared by the STT/TTS failure paths
+STT_TIMEOUT_DETAIL = "Transcription timeout. Please try again."
+STT_ERROR_DETAIL = "Error transcribing audio"
+TTS_TIMEOUT_DETAIL = "Text-to-speech timeout. Please try again."
+TTS_ERROR_DETAIL = "Error converting text to speech"
+
+# Dedicated pools so slow transcriptions can't starve TTS, bcrypt or the default executor
+STT_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="stt")
+TTS_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tts")
+
+# Long replies are synthesized as sentence chunks in parallel, then concatenated
+# (MP3 frames are catenable); short sentences are grouped to limit request count
+SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+TTS_CHUNK_MIN_CHARS = 200
+TTS_MAX_PARTS = 4  # Per reply, so one long reply can't take every TTS_EXECUTOR worker
+
+
+def _split_sentences(text: str) -> list[str]:
+    """
+    Split text on sentence boundaries into at most TTS_MAX_PARTS chunks
+    of at least TTS_CHUNK_MIN_CHARS (longer texts get proportionally larger chunks)
+    """
+    text = text.strip()
+    chunk_chars = max(TTS_CHUNK_MIN_CHARS, -(-len(text) // TTS_MAX_PARTS))
+    chunks = []
+    current = ""
+    for sentence in SENTENCE_SPLIT_RE.split(text):
+        current = f"{current} {sentence}" if current else sentence
+        if len(current) >= chunk_chars:
+            chunks.append(current)
+            current = ""
+    if current:
+        chunks.append(current)
+    # Greedy grouping can overshoot by one chunk; fold the remainder into the last part
+    if len(chunks) > TTS_MAX_PARTS:
+        chunks[TTS_MAX_PARTS - 1:] = [" ".join(chunks[TTS_MAX_PARTS - 1:])]
+    return chunks
+
+
+def _concat_parts_sync(part_paths: list[str], output_path: str) -> None:
+    """Join MP3 parts in order into output_path"""
+    with open(output_path, "wb") as out:
+        for part_path in part_paths:
+            with open(part_path, "rb") as part:
+                out.write(part.read())
+
+
+def _remove_dir_when_done(futures: list, part_dir: str) -> None:
+    """
+    Remove part_dir once every worker thread using it has finished
+    (after a timeout the threads keep running, so cleanup can't happen earlier)
+    """
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def _on_done(_future) -> None:
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            shutil.rmtree(part_dir, ignore_errors=True)
+
+    for future in futures:
+        future.add_done_callback(_on_done)
+
+
+def _remove_parts(part_paths: list[str]) -> None:
+    """Delete temporary MP3 parts, ignoring ones that were never written"""
+    for part_path in part_paths:
+        try:
+            os.unlink(part_path)
+        except FileNotFoundError:
+            pass
+
 # Try AssemblyAI for STT (free, MP3 support, no FFmpeg)
 try:
     import assemblyai as aai  # type: ignore
     ASSEMBLYAI_AVAILABLE = True
-    print("[OK] AssemblyAI loaded successfully")
+    logger.info("AssemblyAI loaded successfully")
 except ImportError:
-    print("[WARNING] AssemblyAI not available. Install: pip install assemblyai")
+    logger.warning("AssemblyAI not available. Install: pip install assemblyai")
     ASSEMBLYAI_AVAILABLE = False
     aai = None
 
+# Configure the process-global AssemblyAI key once, not per SpeechService instance
+STT_USE_WHISPER = settings.STT_BACKEND.lower() == "whisper"
+if ASSEMBLYAI_AVAILABLE and not STT_USE_WHISPER:
+    if settings.ASSEMBLYAI_API_KEY:
+        aai.settings.api_key = settings.ASSEMBLYAI_API_KEY
+        logger.info("AssemblyAI API key configured")
+    else:
+        logger.warning("ASSEMBLYAI_API_KEY not set in .env")
+
+# Try faster-whisper for local STT (optional, selected with STT_BACKEND=whisper)
+try:
+    from faster_whisper import WhisperModel  # type: ignore
+    WHISPER_AVAILABLE = True
+except ImportError:
+    WHISPER_AVAILABLE = False
+    WhisperModel = None
+
 # Try gTTS for TTS (free, no API key needed)
 try:
     from gtts import gTTS  # type: ignore
     import pygame  # type: ignore
     GTTS_AVAILABLE = True
-    print("[OK] gTTS loaded successfully")
+    logger.info("gTTS loaded successfully")
 except ImportError:
-    print("[WARNING] gTTS not available. Install: pip install gtts pygame")
+    logger.warning("gTTS not available. Install: pip install gtts pygame")
     GTTS_AVAILABLE = False
     gTTS = None
 
 class SpeechService:
     def __init__(self):
-        self.settings = get_settings()
+        self.use_whisper = STT_USE_WHISPER
+        self.whisper_model = None
+        self.transcriber = None
         
-        # Initialize AssemblyAI for STT
-        if ASSEMBLYAI_AVAILABLE and aai:
-            api_key = self.settings.ASSEMBLYAI_API_KEY
-            if api_key:
-                aai.settings.api_key = api_key
-                print("[OK] AssemblyAI API key configured")
+        # Load the local Whisper model once instead of per request
+        if self.use_whisper:
+            if WHISPER_AVAILABLE:
+                self.whisper_model = WhisperModel(
+                    settings.WHISPER_MODEL,
+                    device=settings.WHISPER_DEVICE,
+                    compute_type=settings.WHISPER_COMPUTE_TYPE
+                )
+                logger.info("faster-whisper model loaded: %s", settings.WHISPER_MODEL)
             else:
-                print("[WARNING] ASSEMBLYAI_API_KEY not set in .env")
+                logger.warning("faster-whisper not available. Install: pip install faster-whisper")
+        
+        # One shared AssemblyAI transcriber so its HTTP connections are reused across requests
+        elif ASSEMBLYAI_AVAILABLE and aai:
+            self.transcriber = aai.Transcriber()
 
-    def _transcribe_sync(self, audio_file_path: str) -> str:
+    def _transcribe_sync(self, audio: Union[str, BinaryIO]) -> str:
         """Synchronous transcription - runs in thread pool to avoid blocking event loop"""
-        transcriber = aai.Transcriber()
-        transcript = transcriber.transcribe(audio_file_path)
+        if self.whisper_model is not None:
+            return self._transcribe_whisper_sync(audio)
+        
+        transcript = self.transcriber.transcribe(audio)
         
         if transcript.status == aai.TranscriptStatus.error:
             raise HTTPException(
@@ -61,38 +172,59 @@ class SpeechService:
         
         return text
     
-    async def convert_voice_to_text(self, audio_file_path: str) -> str:
-        """STT: Convert voice note (MP3) to text using AssemblyAI"""
-        if not ASSEMBLYAI_AVAILABLE or not aai:
+    def _transcribe_whisper_sync(self, audio: Union[str, BinaryIO]) -> str:
+        """Local transcription with faster-whisper (no upload/poll round-trips)"""
+        segments, _ = self.whisper_model.transcribe(audio, beam_size=5, vad_filter=True)
+        text = " ".join(segment.text.strip() for segment in segments).strip()
+        if not text:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Could not transcribe audio. Please ensure audio is clear and contains speech."
+            )
+        return text
+    
+    async def convert_voice_to_text(self, audio: Union[str, BinaryIO]) -> str:
+        """
+        STT: Convert voice note (MP3) to text using AssemblyAI or local faster-whisper
+        Accepts a file path or an open binary stream (e.g. UploadFile.file)
+        """
+        if self.use_whisper:
+            if self.whisper_model is None:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="faster-whisper not available. Please install: pip install faster-whisper"
+                )
+        elif not ASSEMBLYAI_AVAILABLE or not aai:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="AssemblyAI not available. Please install: pip install assemblyai"
             )
         
         try:
-            print(f"[STT] Transcribing audio: {audio_file_path}")
+            logger.info("STT transcribing %s", audio if isinstance(audio, str) else "upload stream")
             # Run blocking operation in thread pool with timeout
-            loop = asyncio.get_event_loop()
+            loop = asyncio.get_running_loop()
             text = await asyncio.wait_for(
-                loop.run_in_executor(None, self._transcribe_sync, audio_file_path),
+                loop.run_in_executor(STT_EXECUTOR, self._transcribe_sync, audio),
                 timeout=STT_TIMEOUT
             )
-            print(f"[OK] STT transcribed ({len(text)} chars): {text[:100]}...")
+            logger.debug("STT transcribed %d chars: %.100s", len(text), text)
             return text
         except asyncio.TimeoutError:
-            print(f"[ERROR] STT timeout after {STT_TIMEOUT}s")
+            logger.error("STT timeout after %ss", STT_TIMEOUT)
             raise HTTPException(
                 status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                detail="Transcription timeout. Please try again."
-            )
+                detail=STT_TIMEOUT_DETAIL
+            ) from None
         except HTTPException:
             raise
         except Exception as e:
-            print(f"[ERROR] STT error: {str(e)}")
+            # Traceback goes to the log once; clients get a fixed message
+            logger.exception("STT failure")
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Error transcribing audio: {str(e)}"
-            )
+                detail=STT_ERROR_DETAIL
+            ) from e
     
     def _generate_tts_sync(self, text: str, output_path: str) -> str:
         """Synchronous TTS generation - runs in thread pool to avoid blocking event loop"""
@@ -100,6 +232,30 @@ class SpeechService:
         tts.save(output_path)
         return output_path
     
+    async def _synthesize(self, text: str, output_path: str) -> str:
+        """Synthesize text, fanning sentence chunks out over TTS_EXECUTOR when there are several"""
+        loop = asyncio.get_running_loop()
+        chunks = _split_sentences(text)
+        if len(chunks) <= 1:
+            return await loop.run_in_executor(TTS_EXECUTOR, self._generate_tts_sync, text, output_path)
+
+        # Parts live in a private temp dir, never in uploads/
+        part_dir = tempfile.mkdtemp(prefix="tts_parts_")
+        part_paths = [os.path.join(part_dir, f"part{i}.mp3") for i in range(len(chunks))]
+        # Thread futures (not asyncio wrappers) so cleanup waits for the real work
+        futures = [
+            TTS_EXECUTOR.submit(self._generate_tts_sync, chunk, part_path)
+            for chunk, part_path in zip(chunks, part_paths)
+        ]
+        try:
+            await asyncio.gather(*[asyncio.wrap_future(f, loop=loop) for f in futures])
+            concat_future = TTS_EXECUTOR.submit(_concat_parts_sync, part_paths, output_path)
+            futures.append(concat_future)
+            await asyncio.wrap_future(concat_future, loop=loop)
+        finally:
+            _remove_dir_when_done(futures, part_dir)
+        return output_path
+
     async def convert_text_to_speech(self, text: str, output_path: str) -> str:
         """TTS: Convert text to audio file using gTTS"""
         if not GTTS_AVAILABLE or not gTTS:
@@ -109,27 +265,52 @@ class SpeechService:
             )
         
         try:
-            print(f"[TTS] Converting text to speech ({len(text)} chars)")
+            logger.info("TTS converting %d chars", len(text))
             # Run blocking gTTS operation in thread pool with timeout
-            loop = asyncio.get_event_loop()
             result = await asyncio.wait_for(
-                loop.run_in_executor(None, self._generate_tts_sync, text, output_path),
+                self._synthesize(text, output_path),
                 timeout=TTS_TIMEOUT
             )
-            print(f"[OK] TTS audio saved: {output_path}")
+            logger.info("TTS audio saved: %s", output_path)
             return result
         except asyncio.TimeoutError:
-            print(f"[ERROR] TTS timeout after {TTS_TIMEOUT}s")
+            logger.error("TTS timeout after %ss", TTS_TIMEOUT)
             raise HTTPException(
                 status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                detail="Text-to-speech timeout. Please try again."
-            )
+                detail=TTS_TIMEOUT_DETAIL
+            ) from None
         except Exception as e:
-            print(f"[ERROR] TTS error: {str(e)}")
+            logger.exception("TTS failure")
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Error converting text to speech: {str(e)}"
-            )
+                detail=TTS_ERROR_DETAIL
+            ) from e
+
+    async def warmup(self) -> None:
+        """Prime TTS/STT state (gTTS HTTP session, Whisper model) so the first user doesn't pay for it"""
+        loop = asyncio.get_running_loop()
+        if GTTS_AVAILABLE and gTTS:
+            # Unique file per process, so workers starting together don't clobber each other
+            fd, warmup_path = tempfile.mkstemp(prefix="tts_warmup_", suffix=".mp3")
+            os.close(fd)
+            future = TTS_EXECUTOR.submit(self._generate_tts_sync, "ok", warmup_path)
+            # Delete only once the worker is done writing (it outlives a timeout or cancel)
+            future.add_done_callback(lambda _: _remove_parts([warmup_path]))
+            try:
+                await asyncio.wait_for(asyncio.wrap_future(future, loop=loop), timeout=TTS_TIMEOUT)
+                logger.info("TTS warmed up")
+            except Exception as e:
+                logger.warning("TTS warmup failed: %r", e)
+        
+        # Cloud STT is billed per call, so only the local model gets a dummy pass
+        if self.whisper_model is not None:
+            try:
+                import numpy as np  # type: ignore  # installed with faster-whisper
+                silence = np.zeros(16000, dtype=np.float32)  # 1s at 16kHz
+                await loop.run_in_executor(STT_EXECUTOR, lambda: list(self.whisper_model.transcribe(silence)[0]))
+                logger.info("Whisper warmed up")
+            except Exception as e:
+                logger.warning("Whisper warmup failed: %r", e)
 
 # Singleton instance
 speech_service = SpeechService()
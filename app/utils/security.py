@@ -1,43 +1,133 @@
 from datetime import datetime, timedelta, timezone
 from typing import Optional # type: ignore
-from passlib.context import CryptContext # type: ignore
+import bcrypt # type: ignore
 from jose import jwt # type: ignore
+from cachetools import TTLCache # type: ignore
 from app.config import settings
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import base64
+import hashlib
+import hmac
+import orjson # type: ignore
+import os
+import re
 import secrets # type: ignore
+import time
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing: bcrypt is called directly; cost is configurable and
+# existing hashes keep verifying since bcrypt stores the cost per hash
+_BCRYPT_ROUNDS = settings.BCRYPT_ROUNDS
+_BCRYPT_MAX_BYTES = 72  # bcrypt ignores input past this; truncated as passlib used to
+# Well-formed bcrypt hash; bcrypt itself can panic (not just raise) on malformed ones
+_BCRYPT_HASH_RE = re.compile(r"\$2[aby]\$\d{2}\$[./A-Za-z0-9]{53}")
+
+# bcrypt is CPU-bound; run it on its own pool so logins neither block the
+# event loop nor compete with other work on the default executor
+BCRYPT_EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="bcrypt")
+
+# Token lifetimes, computed once
+ACCESS_TOKEN_LIFETIME_SECONDS = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+RESET_TOKEN_LIFETIME = timedelta(minutes=settings.RESET_TOKEN_EXPIRE_MINUTES)
+
+# HMAC JWTs are signed directly with a pre-encoded header; other algorithms go through jose
+_HMAC_DIGESTS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+_JWT_DIGEST = _HMAC_DIGESTS.get(settings.ALGORITHM)
+_JWT_KEY = settings.SECRET_KEY.encode("utf-8")
+_JWT_HEADER_B64 = base64.urlsafe_b64encode(
+    orjson.dumps({"alg": settings.ALGORITHM, "typ": "JWT"})
+).rstrip(b"=")
+
+
+def _b64url(data: bytes) -> bytes:
+    """Unpadded url-safe base64, as used by JWS"""
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _encode_jwt(claims: dict) -> str:
+    """Encode and sign a JWT, skipping jose's per-call header build for HMAC algorithms"""
+    if _JWT_DIGEST is None:
+        return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    signing_input = _JWT_HEADER_B64 + b"." + _b64url(orjson.dumps(claims))
+    signature = hmac.new(_JWT_KEY, signing_input, _JWT_DIGEST).digest()
+    return (signing_input + b"." + _b64url(signature)).decode("ascii")
+
+
+# Recently signed access tokens: (claims, lifetime) -> (token, exp timestamp)
+TOKEN_CACHE_TTL = 60  # seconds
+TOKEN_REUSE_MIN_REMAINING = 60  # Only reuse a cached token with more lifetime left than this
+_token_cache: TTLCache = TTLCache(maxsize=10000, ttl=TOKEN_CACHE_TTL)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    """Verify a password against its hash (unrecognised or malformed hashes never match)"""
+    if not _BCRYPT_HASH_RE.fullmatch(hashed_password):
+        return False
+    try:
+        return bcrypt.checkpw(
+            plain_password.encode("utf-8")[:_BCRYPT_MAX_BYTES],
+            hashed_password.encode("utf-8")
+        )
+    except ValueError:
+        return False
 
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    return bcrypt.hashpw(
+        password.encode("utf-8")[:_BCRYPT_MAX_BYTES],
+        bcrypt.gensalt(_BCRYPT_ROUNDS)
+    ).decode("utf-8")
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(BCRYPT_EXECUTOR, verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(BCRYPT_EXECUTOR, get_password_hash, password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    """Create JWT access token"""
+    """
+    Create JWT access token
+    A token signed for the same claims and lifetime within the last
+    TOKEN_CACHE_TTL seconds is reused instead of being signed again
+    """
+    now = time.time()  # Single clock read; exp is plain epoch seconds
+    cache_key = (frozenset(data.items()), expires_delta)
+    cached = _token_cache.get(cache_key)
+    if cached and cached[1] - now > TOKEN_REUSE_MIN_REMAINING:
+        return cached[0]
+    
     to_encode = data.copy()
     if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
+        expire = int(now + expires_delta.total_seconds())
     else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = int(now) + ACCESS_TOKEN_LIFETIME_SECONDS
     
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    to_encode["exp"] = expire
+    encoded_jwt = _encode_jwt(to_encode)
+    _token_cache[cache_key] = (encoded_jwt, expire)
     return encoded_jwt
 
 
+# Bound once so reset-token generation skips the module attribute lookups
+_token_bytes = secrets.token_bytes
+_urlsafe_b64encode = base64.urlsafe_b64encode
+RESET_TOKEN_BYTES = 32  # 256 bits, encoded as 43 url-safe characters
+
+
 def generate_reset_token() -> str:
     """Generate a secure random token for password reset"""
-    return secrets.token_urlsafe(32)
+    return _urlsafe_b64encode(_token_bytes(RESET_TOKEN_BYTES)).rstrip(b"=").decode("ascii")
 
 
 def create_reset_token_expiry() -> datetime:
     """Create expiry datetime for reset token"""
-    return datetime.now(timezone.utc) + timedelta(minutes=settings.RESET_TOKEN_EXPIRE_MINUTES)
+    return datetime.now(timezone.utc) + RESET_TOKEN_LIFETIME
 
@@ -1,11 +1,17 @@
 import re
+import string
 from fastapi import HTTPException, status # type: ignore
 
+# Patterns compiled once at import
+EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+# Allowed username characters; a set check is cheaper than a regex match
+USERNAME_CHARS = frozenset(string.ascii_letters + string.digits + "_")
+
 
 def validate_email(email: str) -> bool:
     """Validate email format"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return EMAIL_RE.match(email) is not None
 
 
 def validate_password_strength(password: str) -> None:
@@ -23,19 +29,31 @@ def validate_password_strength(password: str) -> None:
             detail="Password must be at least 8 characters long"
         )
     
-    if not re.search(r'[A-Z]', password):
+    # Single pass over the password, stopping once every character class is seen
+    has_upper = has_lower = has_digit = False
+    for ch in password:
+        if "A" <= ch <= "Z":
+            has_upper = True
+        elif "a" <= ch <= "z":
+            has_lower = True
+        elif ch.isdecimal():
+            has_digit = True
+        if has_upper and has_lower and has_digit:
+            break
+    
+    if not has_upper:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Password must contain at least one uppercase letter"
         )
     
-    if not re.search(r'[a-z]', password):
+    if not has_lower:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Password must contain at least one lowercase letter"
         )
     
-    if not re.search(r'\d', password):
+    if not has_digit:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Password must contain at least one number"
@@ -44,13 +62,13 @@ def validate_password_strength(password: str) -> None:
 
 def validate_username(username: str) -> None:
     """Validate username format"""
-    if len(username) < 3 or len(username) > 50:
+    if not 3 <= len(username) <= 50:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username must be between 3 and 50 characters"
         )
     
-    if not re.match(r'^[a-zA-Z0-9_]+$', username):
+    if not USERNAME_CHARS.issuperset(username):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username can only contain letters, numbers, and underscores"
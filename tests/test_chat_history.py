@@ -0,0 +1,74 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app.models.chat import ChatHistory
+
+
+@pytest.fixture
+def chats(session_factory, user):
+    # Every row shares one created_at, so only the id tiebreak orders them
+    created_at = datetime(2024, 1, 1, 12, 0, 0)
+    chats = [
+        ChatHistory(id=uuid.uuid4(), user_id=user.id, message=f"m{i}", response=f"r{i}", created_at=created_at)
+        for i in range(5)
+    ]
+
+    async def add_chats():
+        async with session_factory() as db:
+            db.add_all(chats)
+            await db.commit()
+    asyncio.run(add_chats())
+    return chats
+
+
+def test_cursor_pages_through_rows_with_same_created_at(chat_client, chats):
+    seen = []
+    params = {"limit": 2}
+    while True:
+        r = chat_client.get("/api/chat/history", params=params)
+        assert r.status_code == 200, r.text
+        seen.extend(item["id"] for item in r.json())
+        if "X-Next-Cursor-Id" not in r.headers:
+            break
+        params = {
+            "limit": 2,
+            "cursor_created_at": r.headers["X-Next-Cursor-Created-At"],
+            "cursor_id": r.headers["X-Next-Cursor-Id"],
+        }
+
+    expected = [str(c.id) for c in sorted(chats, key=lambda c: c.id, reverse=True)]
+    assert seen == expected
+
+
+@pytest.mark.parametrize("params", [
+    {"cursor_created_at": "2024-01-01T12:00:00"},
+    {"cursor_id": str(uuid.uuid4())},
+])
+def test_partial_cursor_is_rejected(chat_client, chats, params):
+    r = chat_client.get("/api/chat/history", params=params)
+    assert r.status_code == 400
+
+
+@pytest.mark.parametrize("params", [
+    {"cursor_created_at": "not-a-date", "cursor_id": str(uuid.uuid4())},
+    {"cursor_created_at": "2024-01-01T12:00:00", "cursor_id": "not-a-uuid"},
+])
+def test_malformed_cursor_is_rejected(chat_client, chats, params):
+    r = chat_client.get("/api/chat/history", params=params)
+    assert r.status_code == 422
+
+
+@pytest.mark.parametrize("params", [{"limit": 0}, {"limit": 101}, {"skip": -1}])
+def test_out_of_range_paging_params_are_rejected(chat_client, chats, params):
+    r = chat_client.get("/api/chat/history", params=params)
+    assert r.status_code == 422
+
+
+def test_empty_history_has_no_next_cursor(chat_client):
+    r = chat_client.get("/api/chat/history", params={"limit": 1})
+    assert r.status_code == 200
+    assert r.json() == []
+    assert "X-Next-Cursor-Id" not in r.headers
@@ -0,0 +1,27 @@
+from fastapi import HTTPException
+
+
+class FakeGemini:
+    def validate_and_process_message(self, message):
+        return message
+
+    async def generate_text_response(self, message):
+        return f"reply to {message}"
+
+
+class FailingSpeech:
+    async def convert_text_to_speech(self, text, output_path):
+        raise HTTPException(status_code=504, detail="Text-to-speech timeout. Please try again.")
+
+
+def test_tts_failure_still_answers_and_saves_chat(chat_client, install_service):
+    install_service("gemini_service", FakeGemini())
+    install_service("speech_service", FailingSpeech())
+
+    r = chat_client.post("/api/chat/message", data={"message": "hi"})
+
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["current_chat"]["response"] == "reply to hi"
+    assert body["current_chat"]["response_audio_url"] is None
+    assert body["total_chats"] == 1
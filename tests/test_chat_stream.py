@@ -0,0 +1,67 @@
+import json
+
+from fastapi import HTTPException
+
+
+class FakeGemini:
+    def __init__(self, parts, error=None, sessions=None):
+        self.parts = parts
+        self.error = error
+        self.sessions = sessions
+        self.idle_during_stream = None
+
+    def validate_and_process_message(self, message):
+        return message
+
+    async def stream_text_response(self, message):
+        # The request session must not hold a transaction open while Gemini streams
+        self.idle_during_stream = not any(db.in_transaction() for db in self.sessions)
+        for part in self.parts:
+            yield part
+        if self.error:
+            raise self.error
+
+
+def _events(body: str):
+    """Parse an SSE body into (event, data) pairs"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        event = None
+        data = []
+        for line in block.split("\n"):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data.append(line[len("data: "):])
+        events.append((event, "\n".join(data)))
+    return events
+
+
+def test_stream_sends_chunks_then_done_with_saved_chat(chat_client, install_service):
+    gemini = install_service("gemini_service", FakeGemini(["Hel", "lo\nworld"], sessions=chat_client.sessions))
+
+    r = chat_client.post("/api/chat/message/stream", data={"message": "hi"})
+
+    assert r.status_code == 200
+    events = _events(r.text)
+    assert events[:2] == [(None, "Hel"), (None, "lo\nworld")]
+    event, data = events[-1]
+    assert event == "done"
+    payload = json.loads(data)
+    assert payload["current_chat"]["message"] == "hi"
+    assert payload["current_chat"]["response"] == "Hello\nworld"
+    assert payload["total_chats"] == 1
+    assert gemini.idle_during_stream
+
+    history = chat_client.get("/api/chat/history").json()
+    assert [chat["response"] for chat in history] == ["Hello\nworld"]
+
+
+def test_stream_sends_error_event_and_saves_nothing(chat_client, install_service):
+    install_service("gemini_service", FakeGemini(["partial"], error=HTTPException(status_code=504, detail="AI timeout"), sessions=chat_client.sessions))
+
+    r = chat_client.post("/api/chat/message/stream", data={"message": "hi"})
+
+    assert r.status_code == 200
+    assert _events(r.text) == [(None, "partial"), ("error", "AI timeout")]
+    assert chat_client.get("/api/chat/history").json() == []